@@ -6,7 +6,10 @@ dengan support untuk loopback device (Stereo Mix / VB-Cable).
 """
 
 import asyncio
+import atexit
 import logging
+import math
+import re
 import threading
 from typing import Optional, Callable, Dict
 from dataclasses import dataclass
@@ -23,22 +26,143 @@ except ImportError:
 # Setup logging
 logger = logging.getLogger(__name__)
 
+MAX_INT16 = 32768.0
 
-@dataclass
+# Peak (raw int16) di bawah ini dianggap silent (~ -78 dBFS)
+SILENCE_PEAK = 4
+
+# Keywords nama device loopback, dicek dalam satu pass regex
+_LOOPBACK_RE = re.compile(
+    r"stereo mix|loopback|what u hear|wave out mix|vb-cable",
+    re.IGNORECASE
+)
+
+# Shared PyAudio instance (init PortAudio mahal, cukup sekali per proses)
+_pa_instance = None
+_pa_users = 0
+_pa_lock = threading.Lock()
+
+
+def _terminate_pa():
+    """Terminate shared PyAudio instance (dipanggil saat exit)"""
+    global _pa_instance
+    
+    with _pa_lock:
+        if _pa_instance is not None:
+            _pa_instance.terminate()
+            _pa_instance = None
+
+
+atexit.register(_terminate_pa)
+
+
+def _get_pa():
+    """Get shared PyAudio instance (lazy)"""
+    global _pa_instance
+    
+    with _pa_lock:
+        if _pa_instance is None:
+            _pa_instance = pyaudio.PyAudio()
+        return _pa_instance
+
+
+def _acquire_pa():
+    """
+    Get shared PyAudio instance untuk capture
+    
+    Dicatat sebagai user di lock yang sama, jadi _refresh_pa() tidak bisa
+    terminate instance ini sampai _release_pa() dipanggil.
+    """
+    global _pa_instance, _pa_users
+    
+    with _pa_lock:
+        if _pa_instance is None:
+            _pa_instance = pyaudio.PyAudio()
+        _pa_users += 1
+        return _pa_instance
+
+
+def _release_pa():
+    """Lepas instance yang didapat dari _acquire_pa()"""
+    global _pa_users
+    
+    with _pa_lock:
+        _pa_users -= 1
+
+
+def _refresh_pa() -> bool:
+    """
+    Re-init PortAudio supaya daftar device dibaca ulang
+    
+    Returns:
+        False jika masih ada capture yang memakai instance (tidak di-refresh)
+    """
+    global _pa_instance
+    
+    with _pa_lock:
+        if _pa_users:
+            return False
+        
+        if _pa_instance is not None:
+            _pa_instance.terminate()
+        _pa_instance = pyaudio.PyAudio()
+        return True
+
+
+def _iter_loopback_devices(pa):
+    """Yield (index, info) untuk setiap loopback device dengan input channel"""
+    for i in range(pa.get_device_count()):
+        info = pa.get_device_info_by_index(i)
+        
+        if info.get('maxInputChannels', 0) > 0 and _LOOPBACK_RE.search(info.get('name', '')):
+            yield i, info
+
+
+def _reduce_int16(audio_data):
+    """Hitung (sum_abs, peak, sum_sq) dari buffer int16"""
+    # Peak dulu langsung dari int16 (tanpa alokasi), chunk silent
+    # (umum saat tidak ada media) tidak perlu widen/sum/square
+    peak = max(int(audio_data.max()), -int(audio_data.min()))
+    if peak < SILENCE_PEAK:
+        return 0, 0, 0
+    
+    # Widen ke int32 sekali, abs(-32768) overflow di int16
+    audio_abs = np.abs(audio_data.astype(np.int32))
+    sum_abs = int(audio_abs.sum(dtype=np.int64))
+    
+    # Kuadrat int16 muat di int32, jumlahnya diakumulasi di int64
+    np.multiply(audio_abs, audio_abs, out=audio_abs)
+    sum_sq = int(audio_abs.sum(dtype=np.int64))
+    
+    return sum_abs, peak, sum_sq
+
+
+@dataclass(slots=True)
 class AudioMetrics:
-    """Data class untuk audio metrics"""
+    """
+    Data class untuk audio metrics
+    
+    Satu instance dipakai ulang oleh AudioListener dan di-update in-place
+    setiap chunk. Callback yang menyimpan metrics harus membuat copy.
+    """
     amplitude: float = 0.0  # Mean amplitude (0.0 - 1.0)
     peak: float = 0.0       # Peak amplitude (0.0 - 1.0)
     rms: float = 0.0        # RMS (Root Mean Square) (0.0 - 1.0)
     
     def to_dict(self) -> Dict[str, float]:
-        """Convert ke dictionary"""
+        """Convert ke dictionary (tanpa rounding, format di display layer)"""
         return {
-            "amplitude": round(self.amplitude, 3),
-            "peak": round(self.peak, 3),
-            "rms": round(self.rms, 3)
+            "amplitude": self.amplitude,
+            "peak": self.peak,
+            "rms": self.rms
         }
     
+    def reset(self):
+        """Reset semua metrics ke 0"""
+        self.amplitude = 0.0
+        self.peak = 0.0
+        self.rms = 0.0
+    
     def is_silent(self, threshold: float = 0.01) -> bool:
         """Check apakah audio silent berdasarkan threshold"""
         return self.rms < threshold
@@ -49,7 +173,7 @@ class AudioListener:
     Audio listener untuk capture system audio dan calculate amplitude metrics
     
     Usage:
-        listener = AudioListener(chunk_size=1024, sample_rate=44100)
+        listener = AudioListener(chunk_size=2048, sample_rate=44100)
         
         # Check availability
         if not listener.is_available():
@@ -71,7 +195,7 @@ class AudioListener:
     
     def __init__(
         self,
-        chunk_size: int = 1024,
+        chunk_size: int = 2048,
         sample_rate: int = 44100,
         auto_detect_device: bool = True,
         device_index: Optional[int] = None
@@ -80,7 +204,7 @@ class AudioListener:
         Initialize audio listener
         
         Args:
-            chunk_size: Ukuran buffer audio (default: 1024)
+            chunk_size: Ukuran buffer audio (default: 2048, ~21 update/detik di 44.1 kHz)
             sample_rate: Sample rate dalam Hz (default: 44100)
             auto_detect_device: Auto-detect loopback device (default: True)
             device_index: Manual device index (opsional)
@@ -97,18 +221,28 @@ class AudioListener:
         # PyAudio objects
         self.pyaudio_instance = None
         self.stream = None
+        self._reader_thread: Optional[threading.Thread] = None
         
-        # Audio data buffer
-        self.audio_buffer = np.zeros(chunk_size) if AUDIO_AVAILABLE else None
+        # Audio metrics (di-update in-place oleh reader thread)
         self.current_metrics = AudioMetrics()
         
-        # Callbacks - use thread-safe list
-        self._audio_callbacks = []
+        # Skala normalisasi, chunk_size tetap (blocking read selalu
+        # mengembalikan chunk_size frames)
+        self._amp_scale = 1.0 / (chunk_size * MAX_INT16)
+        self._peak_scale = 1.0 / MAX_INT16
+        self._rms_scale = 1.0 / (math.sqrt(chunk_size) * MAX_INT16)
+        
+        # Callbacks - tuple immutable (is_async, callback), di-rebind saat
+        # registrasi sehingga dispatch cukup satu attribute load tanpa lock/copy
+        self._audio_callbacks: tuple = ()
         self._callbacks_lock = threading.Lock()
         
         # Event loop reference
         self._loop = None
         
+        # True selama drain sudah dijadwalkan di event loop (coalescing)
+        self._drain_scheduled = False
+        
         if not AUDIO_AVAILABLE:
             logger.warning("PyAudio/NumPy not available. Install with: pip install pyaudio numpy")
     
@@ -123,8 +257,9 @@ class AudioListener:
         Register callback untuk audio data
         Callback dipanggil setiap kali ada audio data baru
         """
+        entry = (asyncio.iscoroutinefunction(callback), callback)
         with self._callbacks_lock:
-            self._audio_callbacks.append(callback)
+            self._audio_callbacks = self._audio_callbacks + (entry,)
         return self
     
     async def start(self) -> bool:
@@ -146,7 +281,7 @@ class AudioListener:
             # Store event loop reference
             self._loop = asyncio.get_running_loop()
             
-            self.pyaudio_instance = pyaudio.PyAudio()
+            self.pyaudio_instance = _acquire_pa()
             
             # Detect atau gunakan device index manual
             if self.manual_device_index is not None:
@@ -162,6 +297,7 @@ class AudioListener:
                     "Please enable 'Stereo Mix' in Windows Sound Settings "
                     "or install VB-Cable virtual audio device."
                 )
+                await self._cleanup()
                 return False
             
             # Open audio stream
@@ -171,17 +307,24 @@ class AudioListener:
                 rate=self.sample_rate,
                 input=True,
                 input_device_index=device_index,
-                frames_per_buffer=self.chunk_size,
-                stream_callback=self._audio_callback
+                frames_per_buffer=self.chunk_size
             )
             
             self.stream.start_stream()
             self.is_running = True
             
+            # Blocking read di thread sendiri, bukan PortAudio callback
+            self._reader_thread = threading.Thread(
+                target=self._reader_loop,
+                daemon=True,
+                name="Audio-Reader"
+            )
+            self._reader_thread.start()
+            
             return True
             
         except Exception as e:
-            logger.error(f"Failed to start audio listener: {e}", exc_info=True)
+            logger.error("Failed to start audio listener: %s", e, exc_info=True)
             await self._cleanup()
             return False
     
@@ -208,20 +351,17 @@ class AudioListener:
             return []
         
         devices = []
-        p = pyaudio.PyAudio()
+        p = _get_pa()
         
-        try:
-            for i in range(p.get_device_count()):
-                info = p.get_device_info_by_index(i)
-                devices.append({
-                    'index': i,
-                    'name': info.get('name', ''),
-                    'max_input_channels': info.get('maxInputChannels', 0),
-                    'max_output_channels': info.get('maxOutputChannels', 0),
-                    'default_sample_rate': info.get('defaultSampleRate', 0)
-                })
-        finally:
-            p.terminate()
+        for i in range(p.get_device_count()):
+            info = p.get_device_info_by_index(i)
+            devices.append({
+                'index': i,
+                'name': info.get('name', ''),
+                'max_input_channels': info.get('maxInputChannels', 0),
+                'max_output_channels': info.get('maxOutputChannels', 0),
+                'default_sample_rate': info.get('defaultSampleRate', 0)
+            })
         
         return devices
     
@@ -235,120 +375,125 @@ class AudioListener:
         if not self.available:
             return []
         
-        loopback_devices = []
-        p = pyaudio.PyAudio()
+        return [
+            {
+                'index': i,
+                'name': info.get('name', ''),
+                'channels': info.get('maxInputChannels', 0)
+            }
+            for i, info in _iter_loopback_devices(_get_pa())
+        ]
+    
+    def rescan_devices(self) -> bool:
+        """
+        Baca ulang daftar audio devices (mis. Stereo Mix baru di-enable)
         
-        try:
-            for i in range(p.get_device_count()):
-                info = p.get_device_info_by_index(i)
-                name = info.get('name', '').lower()
-                
-                # Check keywords untuk loopback device
-                keywords = ['stereo mix', 'loopback', 'what u hear', 'wave out mix', 'vb-cable']
-                if any(keyword in name for keyword in keywords):
-                    if info.get('maxInputChannels', 0) > 0:
-                        loopback_devices.append({
-                            'index': i,
-                            'name': info.get('name', ''),
-                            'channels': info.get('maxInputChannels', 0)
-                        })
-        finally:
-            p.terminate()
-        
-        return loopback_devices
+        Returns:
+            True jika berhasil, False jika capture sedang berjalan
+        """
+        if not self.available:
+            return False
+        
+        return _refresh_pa()
     
     # ==================== Internal Methods ====================
     
-    def _audio_callback(self, in_data, frame_count, time_info, status):
-        """Callback untuk audio stream (dipanggil dari thread PyAudio)"""
-        if not self.is_running:
-            return (in_data, pyaudio.paComplete)
+    def _reader_loop(self):
+        """
+        Loop blocking read audio stream (dipanggil dari reader thread)
+        Tidak ada kode Python yang jalan di thread callback PortAudio
+        """
+        # Bind lokal, hindari attribute lookup di setiap chunk
+        read = self.stream.read
+        chunk_size = self.chunk_size
+        frombuffer = np.frombuffer
+        int16 = np.int16
+        calculate_metrics = self._calculate_metrics
+        trigger_callbacks = self._trigger_callbacks_sync
+        metrics = self.current_metrics
         
-        try:
-            # Convert audio data ke numpy array
-            self.audio_buffer = np.frombuffer(in_data, dtype=np.int16)
-            
-            # Calculate metrics
-            self.current_metrics = self._calculate_metrics(self.audio_buffer)
-            
-            # Trigger callbacks (thread-safe, non-blocking)
-            self._trigger_callbacks_sync(self.current_metrics)
+        while self.is_running:
+            try:
+                in_data = read(chunk_size, exception_on_overflow=False)
+            except Exception as e:
+                if self.is_running:
+                    logger.error("Error reading audio stream: %s", e)
+                break
             
-        except Exception as e:
-            logger.error(f"Error in audio callback: {e}")
-        
-        return (in_data, pyaudio.paContinue)
+            try:
+                # Calculate metrics langsung dari view read-only (tanpa copy)
+                calculate_metrics(frombuffer(in_data, dtype=int16))
+                
+                # Trigger callbacks (thread-safe, non-blocking)
+                trigger_callbacks(metrics)
+                
+            except Exception as e:
+                logger.error("Error in audio callback: %s", e)
     
     def _calculate_metrics(self, audio_data: np.ndarray) -> AudioMetrics:
-        """Calculate audio metrics dari audio data"""
+        """Calculate audio metrics dari audio data (update self.current_metrics)"""
+        metrics = self.current_metrics
+        
         try:
-            if len(audio_data) == 0:
-                return AudioMetrics()
+            sum_abs, peak, sum_sq = _reduce_int16(audio_data)
             
             # Normalize to float (0.0 - 1.0)
-            audio_abs = np.abs(audio_data)
-            max_int16 = 32768.0
-            
-            # Mean amplitude
-            amplitude = float(audio_abs.mean()) / max_int16
-            
-            # Peak amplitude
-            peak = float(audio_abs.max()) / max_int16
-            
-            # RMS (Root Mean Square)
-            audio_float = audio_data.astype(np.float64)
-            rms_value = np.sqrt(np.mean(audio_float ** 2)) / max_int16
-            rms = float(rms_value)
-            
-            return AudioMetrics(
-                amplitude=amplitude,
-                peak=peak,
-                rms=rms
-            )
+            metrics.amplitude = sum_abs * self._amp_scale
+            metrics.peak = peak * self._peak_scale
+            metrics.rms = math.sqrt(sum_sq) * self._rms_scale
             
         except Exception as e:
-            logger.error(f"Error calculating metrics: {e}")
-            return AudioMetrics()
+            logger.error("Error calculating metrics: %s", e)
+            metrics.reset()
+        
+        return metrics
     
     def _trigger_callbacks_sync(self, metrics: AudioMetrics):
         """
-        Trigger callbacks secara synchronous (thread-safe)
-        Dipanggil dari PyAudio callback thread
+        Jadwalkan dispatch callbacks ke event loop (thread-safe)
+        Dipanggil dari reader thread
+        
+        Maksimal satu wakeup cross-thread yang pending: chunk yang datang
+        sebelum drain berjalan cukup meng-update metrics in-place, drain
+        akan membaca nilai terbaru.
         """
-        with self._callbacks_lock:
-            callbacks = self._audio_callbacks.copy()
+        if self._drain_scheduled:
+            return
         
-        for callback in callbacks:
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        
+        self._drain_scheduled = True
+        try:
+            loop.call_soon_threadsafe(self._drain_callbacks)
+        except RuntimeError:
+            # Loop sudah ditutup di antara pengecekan dan schedule
+            self._drain_scheduled = False
+    
+    def _drain_callbacks(self):
+        """Dispatch metrics terbaru ke semua callbacks (di event loop)"""
+        self._drain_scheduled = False
+        metrics = self.current_metrics
+        
+        for is_async, callback in self._audio_callbacks:
             try:
-                # Check if callback is async
-                if asyncio.iscoroutinefunction(callback):
-                    # Schedule coroutine in event loop (thread-safe)
-                    if self._loop and not self._loop.is_closed():
-                        self._loop.call_soon_threadsafe(
-                            lambda: asyncio.create_task(callback(metrics))
-                        )
+                if is_async:
+                    asyncio.create_task(callback(metrics))
                 else:
-                    # Call sync callback directly
                     callback(metrics)
             except Exception as e:
-                logger.error(f"Error in audio callback: {e}")
+                logger.error("Error in audio callback: %s", e)
     
     def _find_loopback_device(self) -> Optional[int]:
         """Auto-detect loopback device"""
         if not self.pyaudio_instance:
             return None
         
-        for i in range(self.pyaudio_instance.get_device_count()):
-            info = self.pyaudio_instance.get_device_info_by_index(i)
-            name = info.get('name', '').lower()
-            
-            # Check keywords
-            keywords = ['stereo mix', 'loopback', 'what u hear', 'wave out mix', 'vb-cable']
-            if any(keyword in name for keyword in keywords):
-                if info.get('maxInputChannels', 0) > 0:
-                    return i
-        
-        return None
+        return next(
+            (i for i, _ in _iter_loopback_devices(self.pyaudio_instance)),
+            None
+        )
     
     def _get_device_name(self, device_index: int) -> str:
         """Get device name dari index"""
@@ -363,6 +508,11 @@ class AudioListener:
     
     async def _cleanup(self):
         """Cleanup PyAudio resources"""
+        # Tunggu reader thread selesai read terakhir sebelum stream ditutup
+        if self._reader_thread and self._reader_thread.is_alive():
+            await asyncio.to_thread(self._reader_thread.join, 1.0)
+        self._reader_thread = None
+        
         if self.stream:
             try:
                 self.stream.stop_stream()
@@ -371,9 +521,7 @@ class AudioListener:
                 pass
             self.stream = None
         
-        if self.pyaudio_instance:
-            try:
-                self.pyaudio_instance.terminate()
-            except:
-                pass
-            self.pyaudio_instance = None
\ No newline at end of file
+        # Shared PyAudio instance di-terminate via atexit, cukup lepas referensi
+        if self.pyaudio_instance is not None:
+            self.pyaudio_instance = None
+            _release_pa()
\ No newline at end of file
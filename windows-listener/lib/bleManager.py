@@ -1,24 +1,45 @@
 from bleak import BleakScanner, BleakClient
-from .helper import logging
-import json
+from bleak.exc import BleakError
+from .helper import logging, json_dumps_bytes
 import asyncio
+import atexit
+import functools
+import random
 import sys
 import threading
 from typing import Optional
 
+# Penanda di antrian write: "kirim isi slot latest saat giliran ini"
+_LATEST = object()
+
 class BleakManager:
     def __init__(self):
         self.client: BleakClient | None = None
         self.connected_address: str | None = None
         self.connected_name: str | None = None
         self.last_scan_result = []
+        self._name_index: dict[str, str] = {}
 
         self.write_char = None
         self.notify_char = None
+        self._write_fn = None
+        # address -> (write_handle, notify_handle) hasil discovery sebelumnya
+        self._gatt_cache: dict[str, tuple[int | None, int | None]] = {}
 
         self.should_reconnect = False
         self.reconnect_task = None
         self.disconnect_callback = None
+        self._main_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stop_event = asyncio.Event()
+
+        # Antrian write ke BLE, di-drain oleh satu writer task di main loop
+        self._tx_queue: asyncio.Queue | None = None
+        self._writer_task: asyncio.Task | None = None
+        # Slot latest-wins untuk stream realtime (media/audio)
+        self._tx_latest: bytes | None = None
+        self._tx_latest_queued = False
+        # Jumlah payload yang dibuang writer karena BLE tidak terhubung
+        self._tx_dropped = 0
 
         self.logger = logging.getLogger(__name__)
         
@@ -27,6 +48,9 @@ class BleakManager:
         self._ble_loop: Optional[asyncio.AbstractEventLoop] = None
         self._thread_started = threading.Event()
 
+        # Cleanup deterministik saat exit (bukan __del__)
+        atexit.register(self.shutdown)
+
     def _ensure_ble_thread(self):
         """Pastikan BLE thread sudah running"""
         if self._ble_thread is None or not self._ble_thread.is_alive():
@@ -59,7 +83,7 @@ class BleakManager:
             self._ble_loop.run_forever()
             
         except Exception as e:
-            self.logger.error(f"BLE loop error: {e}")
+            self.logger.error("BLE loop error: %s", e)
         finally:
             try:
                 self._ble_loop.close()
@@ -74,22 +98,10 @@ class BleakManager:
         """
         self._ensure_ble_thread()
         
-        # Schedule coroutine di BLE loop dan return future
-        future = asyncio.run_coroutine_threadsafe(coro, self._ble_loop)
-        
-        # Wrap future dalam asyncio.Future untuk bisa di-await
-        loop = asyncio.get_event_loop()
-        result_future = loop.create_future()
-        
-        def callback(fut):
-            try:
-                result = fut.result()
-                loop.call_soon_threadsafe(result_future.set_result, result)
-            except Exception as e:
-                loop.call_soon_threadsafe(result_future.set_exception, e)
-        
-        future.add_done_callback(callback)
-        return await result_future
+        # Schedule coroutine di BLE loop, wrap_future untuk bisa di-await
+        return await asyncio.wrap_future(
+            asyncio.run_coroutine_threadsafe(coro, self._ble_loop)
+        )
 
     async def scan(self):
         """Scan BLE devices"""
@@ -103,17 +115,17 @@ class BleakManager:
 
             if not devices:
                 self.last_scan_result = []
+                self._name_index = {}
                 self.logger.warning("Tidak ada perangkat ditemukan.")
                 return []
 
             self.last_scan_result = devices
-            self.logger.info(f"Found {len(devices)} device(s)")
+            self._name_index = {d.address: d.name or "Unknown" for d in devices}
+            self.logger.info("Found %d device(s)", len(devices))
             return devices
 
-        except Exception as e:
-            self.logger.error(f"Scan error: {e}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            self.logger.exception("Scan error")
             return []
 
     async def connect(self, address: str):
@@ -129,10 +141,8 @@ class BleakManager:
             
             return success
 
-        except Exception as e:
-            self.logger.error(f"Connect error: {e}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            self.logger.exception("Connect error")
             return False
 
     async def _connect_impl(self, address: str):
@@ -151,7 +161,7 @@ class BleakManager:
         self.connected_name = self._resolve_name(address)
         self.should_reconnect = True
 
-        self.logger.info(f"Connected: {self.connected_name} ({address})")
+        self.logger.info("Connected: %s (%s)", self.connected_name, address)
 
         self._discover_characteristics()
         return True
@@ -160,68 +170,183 @@ class BleakManager:
         """Discover GATT characteristics"""
         self.write_char = None
         self.notify_char = None
+        self._write_fn = None
 
         if not self.client:
             return
 
+        # Reconnect ke device yang sama: lookup langsung by handle (dict
+        # lookup di bleak, UUID lookup scan semua characteristic dan raise
+        # jika UUID dobel), tanpa walk semua service. Characteristic object tidak di-cache
+        # karena terikat ke session client sebelumnya.
+        cached = self._gatt_cache.get(self.connected_address)
+        if cached and self._restore_characteristics(*cached):
+            self.logger.info("Characteristics restored from cache")
+        else:
+            self._walk_characteristics()
+
+        # Bind write_gatt_char sekali per koneksi
+        if self.write_char:
+            self._write_fn = functools.partial(
+                self.client.write_gatt_char,
+                self.write_char,
+                response=False
+            )
+
+    def _walk_characteristics(self):
+        """Walk semua service untuk cari write & notify characteristic"""
         self.logger.info("Discovering services & characteristics...")
 
         for service in self.client.services:
             for char in service.characteristics:
-                props = char.properties
+                props = set(char.properties)
 
                 if "write" in props and self.write_char is None:
-                    self.write_char = char.uuid
+                    self.write_char = char
 
                 if "notify" in props and self.notify_char is None:
-                    self.notify_char = char.uuid
+                    self.notify_char = char
 
-        self.logger.info(f"Write char  : {self.write_char}")
-        self.logger.info(f"Notify char : {self.notify_char}")
+                if self.write_char and self.notify_char:
+                    break
 
-    async def write(self, text: str):
-        """Write text to BLE device"""
-        if not self.write_char:
-            self.logger.error("Tidak ada characteristic write!")
-            return False
+            # Stop walk service begitu keduanya ditemukan
+            if self.write_char and self.notify_char:
+                break
 
-        try:
-            await self._run_in_ble_loop(
-                self.client.write_gatt_char(
-                    self.write_char,
-                    text.encode(),
-                    response=False,
-                )
+        # Cache hanya jika write char ditemukan, supaya discovery yang gagal
+        # diulang di reconnect berikutnya
+        if self.connected_address and self.write_char:
+            self._gatt_cache[self.connected_address] = (
+                self.write_char.handle,
+                self.notify_char.handle if self.notify_char else None,
             )
-            return True
 
-        except Exception as e:
-            self.logger.error(f"Write error: {e}")
+        self.logger.info("Write char  : %s", self.write_char.uuid if self.write_char else None)
+        self.logger.info("Notify char : %s", self.notify_char.uuid if self.notify_char else None)
+
+    def _restore_characteristics(self, write_handle, notify_handle) -> bool:
+        """Resolve characteristic dari handle cache, False jika tidak lengkap"""
+        if write_handle is None:
+            return False
+
+        services = self.client.services
+        write_char = services.get_characteristic(write_handle)
+        notify_char = services.get_characteristic(notify_handle) if notify_handle is not None else None
+
+        if write_char is None or (notify_handle is not None and notify_char is None):
             return False
 
-    async def write_json(self, data: dict):
-        """Write JSON data to BLE device"""
+        self.write_char = write_char
+        self.notify_char = notify_char
+        return True
+
+    async def write(self, text: str):
+        """Write text to BLE device"""
+        return await self.write_bytes(text.encode())
+
+    async def write_json(self, data: dict, latest: bool = False):
+        """Write JSON data to BLE device (di-encode di caller, bukan BLE loop)"""
+        if isinstance(data, str):
+            payload = data.encode("utf-8")
+        else:
+            payload = json_dumps_bytes(data)
+
+        success = await self.write_bytes(payload, latest=latest)
+
+        if success:
+            self.logger.debug("Queued JSON: %s", payload)
+        return success
+
+    async def write_bytes(self, payload: bytes, latest: bool = False):
+        """
+        Queue raw bytes untuk dikirim ke BLE device (write-without-response)
+        
+        Caller tidak menunggu GATT write selesai; writer task mengirim
+        payload satu per satu (firmware parse satu JSON per write).
+        Jika antrian penuh, payload paling lama dibuang.
+        
+        Dengan latest=True payload masuk slot latest-wins: selama belum
+        terkirim, payload latest berikutnya hanya mengganti isi slot
+        (frame realtime basi tidak menumpuk saat link BLE lambat).
+        """
         if not self.write_char:
             self.logger.error("Tidak ada characteristic write!")
             return False
 
-        try:
-            json_data = data if isinstance(data, str) else json.dumps(data)
-            
-            await self._run_in_ble_loop(
-                self.client.write_gatt_char(
-                    self.write_char,
-                    json_data.encode("utf-8"),
-                    response=False
+        self._ensure_writer()
+
+        if latest:
+            self._tx_latest = payload
+            if self._tx_latest_queued:
+                return True
+            self._tx_latest_queued = True
+            payload = _LATEST
+
+        queue = self._tx_queue
+        if queue.full() and queue.get_nowait() is _LATEST:
+            self._tx_latest_queued = False
+        queue.put_nowait(payload)
+        return True
+
+    def _ensure_writer(self):
+        """Pastikan writer task sudah running di main loop"""
+        if self._tx_queue is None:
+            self._tx_queue = asyncio.Queue(maxsize=64)
+
+        if self._writer_task is None or self._writer_task.done():
+            self._writer_task = asyncio.create_task(self._writer_loop())
+
+    async def _writer_loop(self):
+        """
+        Drain antrian write ke BLE device
+        
+        Semua payload yang sudah antri diambil sekaligus dan dikirim dalam
+        satu hop ke BLE loop (tetap satu GATT write per payload).
+        """
+        queue = self._tx_queue
+
+        while True:
+            batch = [await queue.get()]
+            while not queue.empty():
+                batch.append(queue.get_nowait())
+
+            # Ganti penanda dengan isi slot latest saat ini
+            if self._tx_latest_queued and _LATEST in batch:
+                batch[batch.index(_LATEST)] = self._tx_latest
+                self._tx_latest_queued = False
+
+            write_fn = self._write_fn
+            if not write_fn or not self.is_connected():
+                self._tx_dropped += len(batch)
+                self.logger.debug(
+                    "Dropped %d payload(s), BLE not connected (total %d)",
+                    len(batch), self._tx_dropped
                 )
-            )
+                continue
 
-            self.logger.debug(f"Sent JSON: {json_data}")
-            return True
+            try:
+                await self._run_in_ble_loop(self._write_batch(write_fn, batch))
+            except Exception as e:
+                self.logger.error("Write error: %s", e)
 
-        except Exception as e:
-            self.logger.error(f"Write JSON error: {e}")
-            return False
+    async def _write_batch(self, write_fn, batch):
+        """Write beberapa payload berurutan (runs in BLE thread)"""
+        for payload in batch:
+            await write_fn(payload)
+
+    async def _stop_writer(self):
+        """Stop writer task dan buang payload yang belum terkirim"""
+        if self._writer_task and not self._writer_task.done():
+            self._writer_task.cancel()
+            try:
+                await self._writer_task
+            except asyncio.CancelledError:
+                pass
+        self._writer_task = None
+        self._tx_queue = None
+        self._tx_latest = None
+        self._tx_latest_queued = False
 
     async def start_notify(self, handler):
         """Start notifications"""
@@ -233,11 +358,11 @@ class BleakManager:
             await self._run_in_ble_loop(
                 self.client.start_notify(self.notify_char, handler)
             )
-            self.logger.info(f"Notify aktif pada {self.notify_char}")
+            self.logger.info("Notify aktif pada %s", self.notify_char.uuid)
             return True
 
         except Exception as e:
-            self.logger.error(f"Notify error: {e}")
+            self.logger.error("Notify error: %s", e)
             return False
 
     async def stop_notify(self):
@@ -258,7 +383,16 @@ class BleakManager:
             clean: True = manual disconnect (bersihkan semua), 
                    False = unexpected disconnect (siapkan reconnect)
         """
+        # Matikan auto-reconnect sebelum client.disconnect(): di Windows
+        # bleak memanggil disconnected_callback sendiri saat disconnect
+        # manual, handler tidak boleh memulai reconnect baru
+        if clean:
+            self.should_reconnect = False
+            # Bangunkan reconnect task yang sedang menunggu backoff
+            self._stop_event.set()
+
         try:
+
             # Cancel reconnect task
             if self.reconnect_task and not self.reconnect_task.done():
                 self.reconnect_task.cancel()
@@ -270,43 +404,52 @@ class BleakManager:
 
             # Disconnect dari device
             if self.client and self.client.is_connected:
-                await self.stop_notify()
+                # stop_notify hanya untuk manual disconnect, peer yang
+                # sudah hilang hanya akan membuat ATT request timeout
+                if clean and self.notify_char:
+                    await self.stop_notify()
                 
-                await self._run_in_ble_loop(
-                    self.client.disconnect()
-                )
+                try:
+                    await self._run_in_ble_loop(
+                        asyncio.wait_for(self.client.disconnect(), timeout=1.0)
+                    )
+                except asyncio.TimeoutError:
+                    self.logger.warning("Disconnect timeout, lanjut bersihkan state")
+
+        except Exception as e:
+            self.logger.error("Disconnect error: %s", e)
 
+        finally:
+            # State selalu dibersihkan, walau disconnect gagal/timeout
             if clean:
                 self.logger.info("Clean disconnect - clearing all state")
+                await self._stop_writer()
                 self.should_reconnect = False
                 self.client = None
                 self.connected_address = None
                 self.connected_name = None
                 self.write_char = None
                 self.notify_char = None
+                self._write_fn = None
             else:
                 self.logger.warning("Unexpected disconnect - keeping state for reconnect")
                 self.client = None
-
-        except Exception as e:
-            self.logger.error(f"Disconnect error: {e}")
+                self._write_fn = None
 
     def _on_disconnect_event(self, client: BleakClient):
         """Callback saat BLE server disconnect (called from BLE thread)"""
-        self.logger.warning(f"BLE server disconnected: {self.connected_name}")
+        self.logger.warning("BLE server disconnected: %s", self.connected_name)
         
         # Schedule handler di main loop
         if self.disconnect_callback:
             try:
-                # Get main loop and schedule callback
-                import asyncio
-                main_loop = asyncio.get_event_loop()
+                main_loop = self._main_loop
                 if main_loop and main_loop.is_running():
-                    main_loop.call_soon_threadsafe(
-                        lambda: asyncio.create_task(self._handle_disconnect())
+                    asyncio.run_coroutine_threadsafe(
+                        self._handle_disconnect(), main_loop
                     )
             except Exception as e:
-                self.logger.warning(f"Cannot schedule disconnect handler: {e}")
+                self.logger.warning("Cannot schedule disconnect handler: %s", e)
 
     async def _handle_disconnect(self):
         """Handle unexpected disconnect (runs in main loop)"""
@@ -315,6 +458,7 @@ class BleakManager:
         
         if self.should_reconnect and self.connected_address:
             self.logger.info("Starting auto-reconnect...")
+            self._stop_event.clear()
             self.reconnect_task = asyncio.create_task(self._auto_reconnect())
 
     async def _auto_reconnect(self):
@@ -324,10 +468,21 @@ class BleakManager:
         while self.should_reconnect and self.connected_address:
             try:
                 retry_count += 1
-                interval = 2
+                # Exponential backoff: 1s, 2s, 4s, ... max 30s, plus jitter
+                interval = min(30, 0.5 * 2 ** min(retry_count, 6)) + random.uniform(0, 0.25)
                 
-                self.logger.info(f"Reconnect attempt #{retry_count} in {interval}s...")
-                await asyncio.sleep(interval)
+                self.logger.info("Reconnect attempt #%s in %.2fs...", retry_count, interval)
+                
+                # Tunggu backoff, keluar segera jika disconnect(clean=True)
+                try:
+                    await asyncio.wait_for(self._stop_event.wait(), timeout=interval)
+                    return
+                except asyncio.TimeoutError:
+                    pass
+
+                # State bisa berubah selama backoff (disconnect manual)
+                if not (self.should_reconnect and self.connected_address):
+                    return
 
                 # Reconnect di BLE thread
                 success = await self._run_in_ble_loop(
@@ -335,24 +490,40 @@ class BleakManager:
                 )
 
                 if success:
-                    self.logger.info(f"Reconnected successfully to {self.connected_name}")
+                    self.logger.info("Reconnected successfully to %s", self.connected_name)
                     
                     if self.disconnect_callback:
                         self.disconnect_callback()
                     
-                    break
+                    return
+
+            except (asyncio.TimeoutError, BleakError) as e:
+                # Device belum siap, client yang sama dipakai lagi
+                self.logger.debug("Reconnect failed: %s", e)
+                continue
 
             except Exception as e:
-                self.logger.debug(f"Reconnect failed: {e}")
+                # State client tidak jelas, buat ulang di attempt berikutnya
+                self.logger.debug("Reconnect failed: %s", e)
                 self.client = None
                 continue
 
     async def _reconnect_impl(self):
         """Implementation reconnect (runs in BLE thread)"""
-        self.client = BleakClient(
-            self.connected_address, 
-            disconnected_callback=self._on_disconnect_event
-        )
+        # BleakClient dibuat sekali lalu dipakai ulang di setiap attempt
+        if self.client is None:
+            # Tunggu device advertise dulu (early-exit), hindari connect
+            # attempt yang pasti gagal saat device belum terlihat
+            device = await BleakScanner.find_device_by_address(
+                self.connected_address, timeout=5
+            )
+            if device is None:
+                return False
+
+            self.client = BleakClient(
+                device, 
+                disconnected_callback=self._on_disconnect_event
+            )
         
         await self.client.connect()
 
@@ -363,14 +534,13 @@ class BleakManager:
         return False
 
     def set_disconnect_callback(self, callback):
-        """Set callback untuk disconnect event"""
+        """Set callback untuk disconnect event (dipanggil dari main loop)"""
         self.disconnect_callback = callback
+        self._main_loop = asyncio.get_running_loop()
 
     def is_connected(self) -> bool:
         """Check if connected to BLE device"""
-        connected = self.client is not None and self.client.is_connected
-        self.logger.debug(f"BLE connected status: {connected}")
-        return connected
+        return self.client is not None and self.client.is_connected
 
     def get_connected_address(self):
         """Get connected device address"""
@@ -380,23 +550,30 @@ class BleakManager:
         """Get connected device name"""
         return self.connected_name or "Unknown"
 
+    def get_status(self) -> tuple[bool, str, str | None]:
+        """Snapshot (connected, name, address) dalam satu panggilan"""
+        return self.is_connected(), self.get_connected_name(), self.connected_address
+
     def _resolve_name(self, address: str) -> str:
         """Resolve device name from address"""
-        for dev in self.last_scan_result:
-            if dev.address == address:
-                self.logger.debug(f"Resolved name for {address}: {dev.name or 'Unknown'}")
-                return dev.name or "Unknown"
-        self.logger.debug(f"Name for {address} tidak ditemukan di cached scan.")
-        return "Unknown"
+        name = self._name_index.get(address)
+        if name is None:
+            self.logger.debug("Name for %s tidak ditemukan di cached scan.", address)
+            return "Unknown"
+        self.logger.debug("Resolved name for %s: %s", address, name)
+        return name
     
     def shutdown(self):
-        """Cleanup BLE thread"""
-        if self._ble_loop and self._ble_loop.is_running():
-            self._ble_loop.call_soon_threadsafe(self._ble_loop.stop)
-    
-    def __del__(self):
-        """Cleanup on deletion"""
-        try:
-            self.shutdown()
-        except:
-            pass
\ No newline at end of file
+        """Cleanup BLE thread (idempotent)"""
+        atexit.unregister(self.shutdown)
+
+        loop = self._ble_loop
+        if loop and loop.is_running():
+            loop.call_soon_threadsafe(loop.stop)
+
+        # Tunggu loop benar-benar berhenti (kecuali dipanggil dari BLE thread)
+        thread = self._ble_thread
+        if thread and thread.is_alive() and thread is not threading.current_thread():
+            thread.join(timeout=2)
+
+        self._ble_thread = None
\ No newline at end of file
@@ -1,8 +1,15 @@
+import json
 import logging
 
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
+
+
+def json_dumps(data) -> str:
+    """Serialize data ke compact JSON string"""
+    return json.dumps(data, separators=(',', ':'))
+
+
+def json_dumps_bytes(data) -> bytes:
+    """Serialize data ke compact JSON bytes"""
+    return json.dumps(data, separators=(',', ':')).encode("utf-8")
@@ -6,9 +6,9 @@ dengan JSON output format.
 """
 
 import asyncio
-import json
 from typing import Optional, Callable
 from lib import WindowsMediaController, AudioListener
+from .helper import json_dumps
 
 
 class MediaAudioMonitor:
@@ -34,7 +34,7 @@ class MediaAudioMonitor:
     def __init__(self):
         # Controllers
         self._media_controller = WindowsMediaController(poll_interval=0.2)
-        self._audio_listener = AudioListener(chunk_size=1024, sample_rate=44100)
+        self._audio_listener = AudioListener(chunk_size=2048, sample_rate=44100)
         
         # Current state
         self._current_data = {
@@ -50,9 +50,16 @@ class MediaAudioMonitor:
             }
         }
         
-        # Update callbacks
+        # Prefix JSON (bagian media) di-build ulang hanya saat media berubah,
+        # get_json cukup menyambung bagian audio_amplitude
+        self._json_prefix = self._build_json_prefix()
+        
+        # Update callbacks: list (is_async, callback), cek coroutine sekali
         self._update_callbacks = []
         
+        # Di-set setiap data berubah (media atau nilai audio)
+        self._changed = asyncio.Event()
+        
         # Running state
         self.is_running = False
     
@@ -77,6 +84,10 @@ class MediaAudioMonitor:
         # Start media controller
         await self._media_controller.start()
         
+        # Event di-skip saat first run, jadi ambil state awal dari cache
+        if await self._media_controller.wait_ready():
+            self._on_media_update(self._media_controller.get_current_media())
+        
         # Setup audio listener
         if self._audio_listener.is_available():
             self._audio_listener.on_audio_data(lambda metrics: self._on_audio_update(metrics))
@@ -104,7 +115,11 @@ class MediaAudioMonitor:
         Returns:
             JSON string dengan format compact
         """
-        return json.dumps(self._current_data, separators=(',', ':'))
+        audio = self._current_data["audio_amplitude"]
+        return (
+            f'{self._json_prefix}{{"amplitude":{audio["amplitude"]!r},'
+            f'"peak":{audio["peak"]!r},"rms":{audio["rms"]!r}}}}}'
+        )
     
     def get_data(self) -> dict:
         """
@@ -113,7 +128,34 @@ class MediaAudioMonitor:
         Returns:
             Dictionary dengan current data
         """
-        return self._current_data.copy()
+        data = self._current_data.copy()
+        # audio_amplitude di-update in-place, jadi copy juga
+        data["audio_amplitude"] = data["audio_amplitude"].copy()
+        return data
+    
+    async def wait_changed(self, timeout: Optional[float] = None) -> bool:
+        """
+        Tunggu sampai data berubah (pengganti polling get_json)
+        
+        Args:
+            timeout: Batas waktu tunggu dalam detik (None = tanpa batas)
+            
+        Returns:
+            True jika ada perubahan, False jika timeout
+        """
+        changed = self._changed
+        if not changed.is_set():
+            try:
+                await asyncio.wait_for(changed.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                return False
+        
+        changed.clear()
+        return True
+    
+    def wake(self):
+        """Bangunkan wait_changed tanpa perubahan data (mis. saat shutdown)"""
+        self._changed.set()
     
     def on_update(self, callback: Callable[[str], None]):
         """
@@ -123,7 +165,9 @@ class MediaAudioMonitor:
         Args:
             callback: Function yang menerima JSON string
         """
-        self._update_callbacks.append(callback)
+        self._update_callbacks.append(
+            (asyncio.iscoroutinefunction(callback), callback)
+        )
         return self
     
     def get_audio_devices(self) -> list:
@@ -138,21 +182,46 @@ class MediaAudioMonitor:
         self._current_data["artist"] = info.artist
         self._current_data["status"] = info.status.name
         self._current_data["is_playing"] = info.is_playing
+        self._json_prefix = self._build_json_prefix()
+        self._changed.set()
         
         # Trigger callbacks
         self._trigger_updates()
     
+    def _build_json_prefix(self) -> str:
+        """Build bagian JSON sebelum nilai audio_amplitude"""
+        data = self._current_data
+        media = json_dumps({
+            "type": data["type"],
+            "title": data["title"],
+            "artist": data["artist"],
+            "status": data["status"],
+            "is_playing": data["is_playing"],
+        })
+        # Buang "}" penutup, lanjut dengan key audio_amplitude
+        return f'{media[:-1]},"audio_amplitude":'
+    
     def _on_audio_update(self, metrics):
         """Handler untuk audio update"""
-        self._current_data["audio_amplitude"] = {
-            "amplitude": round(metrics.amplitude, 2),
-            "peak": round(metrics.peak, 2),
-            "rms": round(metrics.rms, 2)
-        }
+        # Cek sebelum nilai lama ditimpa
+        should_trigger = self._should_trigger_audio_update(metrics)
+        
+        # Update dict audio_amplitude in-place (tanpa alokasi dict baru)
+        audio = self._current_data["audio_amplitude"]
+        amplitude = round(metrics.amplitude, 2)
+        peak = round(metrics.peak, 2)
+        rms = round(metrics.rms, 2)
+        
+        # Hening terus-menerus tidak membangunkan consumer
+        if (amplitude, peak, rms) != (audio["amplitude"], audio["peak"], audio["rms"]):
+            audio["amplitude"] = amplitude
+            audio["peak"] = peak
+            audio["rms"] = rms
+            self._changed.set()
         
         # Trigger callbacks (limit frequency untuk audio)
         # Only trigger if significant change to avoid spam
-        if self._should_trigger_audio_update(metrics):
+        if should_trigger:
             self._trigger_updates()
     
     def _should_trigger_audio_update(self, metrics) -> bool:
@@ -164,12 +233,17 @@ class MediaAudioMonitor:
     
     def _trigger_updates(self):
         """Trigger all registered callbacks"""
+        callbacks = self._update_callbacks
+        if not callbacks:
+            return
+        
         json_data = self.get_json()
+        create_task = asyncio.create_task
         
-        for callback in self._update_callbacks:
+        for is_async, callback in callbacks:
             try:
-                if asyncio.iscoroutinefunction(callback):
-                    asyncio.create_task(callback(json_data))
+                if is_async:
+                    create_task(callback(json_data))
                 else:
                     callback(json_data)
             except Exception:
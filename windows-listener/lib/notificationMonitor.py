@@ -7,9 +7,10 @@ menggunakan WinRT API (native, tanpa PowerShell).
 
 import asyncio
 import logging
+import time
+from collections import OrderedDict, deque
 from typing import Optional, Callable, List, Dict
 from dataclasses import dataclass
-from datetime import datetime, timezone
 
 try:
     import winsdk.windows.ui.notifications as notifications
@@ -20,8 +21,14 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Batas jumlah ID notifikasi / notifikasi yang disimpan di memory
+MAX_SEEN_NOTIFICATIONS = 1024
 
-@dataclass
+# Interval polling cadangan saat event NotificationChanged aktif (detik)
+EVENT_FALLBACK_POLL_INTERVAL = 30.0
+
+
+@dataclass(slots=True)
 class NotificationData:
     id: str
     app_name: str
@@ -53,13 +60,20 @@ class NotificationMonitor:
         self._listener: Optional[
             management.UserNotificationListener
         ] = None
-        self._last_check: datetime = datetime.now(timezone.utc)
+        # Waktu cek terakhir sebagai POSIX timestamp (float compare murah)
+        self._last_check: float = time.time()
 
-        self._seen_notifications = set()
-        self._current_notifications: List[NotificationData] = []
+        # OrderedDict sebagai set ber-urutan: ID tertua dibuang saat penuh
+        self._seen_notifications: OrderedDict = OrderedDict()
+        self._current_notifications: deque = deque(maxlen=MAX_SEEN_NOTIFICATIONS)
         self._notification_callbacks: List[Callable] = []
         self._monitor_task: Optional[asyncio.Task] = None
 
+        # Event NotificationChanged (loop dibangunkan saat ada notifikasi)
+        self._loop_ref: Optional[asyncio.AbstractEventLoop] = None
+        self._changed = asyncio.Event()
+        self._changed_token = None
+
     # ================= Public API =================
 
     def on_notification(self, callback: Callable[[NotificationData], None]):
@@ -75,10 +89,12 @@ class NotificationMonitor:
             access = await self._listener.request_access_async()
 
             if access != management.UserNotificationListenerAccessStatus.ALLOWED:
-                logger.error(f"Notification access denied: {access}")
+                logger.error("Notification access denied: %s", access)
                 return False
 
-            self._last_check = datetime.now(timezone.utc)
+            self._last_check = time.time()
+            self._loop_ref = asyncio.get_running_loop()
+            self._subscribe_events()
             self.is_running = True
             self._monitor_task = asyncio.create_task(self._loop())
             return True
@@ -97,10 +113,11 @@ class NotificationMonitor:
             except asyncio.CancelledError:
                 pass
         self._monitor_task = None
+        self._unsubscribe_events()
         self._listener = None
 
     def get_notifications(self) -> List[NotificationData]:
-        return self._current_notifications.copy()
+        return list(self._current_notifications)
 
     def clear_notifications(self):
         self._seen_notifications.clear()
@@ -111,28 +128,63 @@ class NotificationMonitor:
     async def _loop(self):
         try:
             while self.is_running:
+                self._changed.clear()
                 await self._check_notifications()
-                await asyncio.sleep(self.check_interval)
+
+                # Dengan event aktif, polling hanya sebagai safety net
+                interval = (
+                    EVENT_FALLBACK_POLL_INTERVAL if self._changed_token
+                    else self.check_interval
+                )
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout=interval)
+                except asyncio.TimeoutError:
+                    pass
         except asyncio.CancelledError:
             pass
 
+    def _on_notification_changed(self, sender, args):
+        """Handler NotificationChanged (dipanggil dari thread WinRT)"""
+        loop = self._loop_ref
+        if loop and not loop.is_closed():
+            loop.call_soon_threadsafe(self._changed.set)
+
+    def _subscribe_events(self):
+        """Subscribe NotificationChanged, fallback ke polling jika gagal"""
+        try:
+            # Hanya didukung untuk app packaged; unpackaged akan raise
+            self._changed_token = self._listener.add_notification_changed(
+                self._on_notification_changed
+            )
+        except Exception as e:
+            logger.info("Notification events unavailable, polling only: %s", e)
+            self._changed_token = None
+
+    def _unsubscribe_events(self):
+        """Lepas subscription NotificationChanged"""
+        if self._listener and self._changed_token:
+            try:
+                self._listener.remove_notification_changed(self._changed_token)
+            except Exception as e:
+                logger.debug("Failed to remove notification events: %s", e)
+
+        self._changed_token = None
+
     async def _check_notifications(self):
         if not self._listener:
             return
 
+        # Ambil waktu sebelum fetch: notifikasi yang masuk selama fetch
+        # ikut dicek lagi di tick berikutnya (duplikat difilter _seen)
+        now = time.time()
+        last_check = self._last_check
+
         notifs = await self._listener.get_notifications_async(
             notifications.NotificationKinds.TOAST
         )
 
-        now = datetime.now(timezone.utc)
-
         for notif in notifs:
-            creation_time = notif.creation_time
-
-            if hasattr(creation_time, "astimezone"):
-                creation_time = creation_time.astimezone(timezone.utc)
-
-            if creation_time <= self._last_check:
+            if notif.creation_time.timestamp() <= last_check:
                 continue
 
             await self._process_notification(notif)
@@ -141,10 +193,16 @@ class NotificationMonitor:
 
     async def _process_notification(self, notif):
         notif_id = str(notif.id)
-        if notif_id in self._seen_notifications:
+
+        # Insert langsung; ukuran tidak bertambah = ID sudah pernah dilihat
+        seen = self._seen_notifications
+        size = len(seen)
+        seen[notif_id] = None
+        if len(seen) == size:
             return
 
-        self._seen_notifications.add(notif_id)
+        if size >= MAX_SEEN_NOTIFICATIONS:
+            seen.popitem(last=False)
 
         app_info = notif.app_info
         app_name = app_info.display_info.display_name
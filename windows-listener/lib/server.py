@@ -2,7 +2,7 @@ import asyncio
 import json
 from .websocketServer import WebSocketServer
 from .bleManager import BleakManager
-from .helper import logging
+from .helper import logging, json_dumps
 
 
 class Server(WebSocketServer):
@@ -10,9 +10,17 @@ class Server(WebSocketServer):
 
     ble: BleakManager | None = None
     clients = set()
-    tasks = {}
     loop: asyncio.AbstractEventLoop | None = None
 
+    # Slot payload terbaru untuk publish_latest (latest-wins)
+    _latest_payload = None
+    _latest_scheduled = False
+
+    # Satu heartbeat status BLE untuk semua client
+    _heartbeat_task: asyncio.Task | None = None
+    _last_status_key = None
+    STATUS_REFRESH_TICKS = 5  # Kirim ulang status walau tidak berubah (detik)
+
     @classmethod
     def init_loop(cls, loop):
         cls.loop = loop
@@ -20,20 +28,19 @@ class Server(WebSocketServer):
     async def on_connect(self, ws):
         Server.logger.info("Client connected")
         Server.clients.add(ws)
-        Server.tasks[ws] = []
 
-        task = asyncio.create_task(self._ble_status_heartbeat(ws))
-        Server.tasks[ws].append(task)
+        # Client baru harus menerima status di tick berikutnya
+        Server._last_status_key = None
+
+        if Server._heartbeat_task is None or Server._heartbeat_task.done():
+            Server._heartbeat_task = asyncio.create_task(
+                Server._ble_status_heartbeat()
+            )
 
     async def on_disconnect(self, ws):
         Server.logger.info("Client disconnected")
         Server.clients.discard(ws)
 
-        if ws in Server.tasks:
-            for t in Server.tasks[ws]:
-                t.cancel()
-            del Server.tasks[ws]
-
     async def on_message(self, ws, message):
         Server.logger.debug(message)
 
@@ -42,7 +49,8 @@ class Server(WebSocketServer):
             event = data.get("event")
 
             if event == "ble-scan":
-                Server.ble = BleakManager()
+                if not Server.ble:
+                    Server.ble = BleakManager()
                 devices = await Server.ble.scan()
 
                 await self.send(ws, {
@@ -75,9 +83,7 @@ class Server(WebSocketServer):
                 })
 
             elif event == "ble-disconnect":
-                if Server.ble:
-                    await Server.ble.disconnect(clean=True)
-                    Server.ble = None
+                await self.disconnect_ble()
 
                 await self.send(ws, {
                     "event": "ble-disconnect-result",
@@ -89,29 +95,42 @@ class Server(WebSocketServer):
 
     async def disconnect_ble(self):
         if Server.ble:
-            await Server.ble.disconnect(clean=True)
+            ble = Server.ble
             Server.ble = None
+            await ble.disconnect(clean=True)
+            await asyncio.to_thread(ble.shutdown)
+
+    @classmethod
+    async def _ble_status_heartbeat(cls):
+        ticks = 0
 
-    async def _ble_status_heartbeat(self, ws):
         try:
             while True:
                 await asyncio.sleep(1)
 
-                connected = False
-                name = "Unknown"
-                address = None
+                # Tidak ada client, skip baca state BLE
+                if not cls.clients:
+                    continue
 
-                if Server.ble:
-                    connected = Server.ble.is_connected()
-                    name = Server.ble.get_connected_name()
-                    address = Server.ble.get_connected_address()
+                ticks += 1
 
-                await self.send(ws, {
+                ble = cls.ble
+                key = ble.get_status() if ble else (False, "Unknown", None)
+
+                # Hanya kirim saat status berubah (atau refresh berkala)
+                if key == cls._last_status_key and ticks < cls.STATUS_REFRESH_TICKS:
+                    continue
+                cls._last_status_key = key
+                ticks = 0
+
+                # Serialize sekali, kirim ke semua client
+                connected, name, address = key
+                await cls._fan_out(json_dumps({
                     "event": "ble-status-result",
                     "connected": connected,
                     "name": name,
                     "address": address
-                })
+                }))
 
         except asyncio.CancelledError:
             pass
@@ -124,6 +143,11 @@ class Server(WebSocketServer):
             "address": None
         })
 
+    @classmethod
+    def has_subscribers(cls) -> bool:
+        """Ada penerima publish (client WebSocket atau BLE terkoneksi)"""
+        return bool(cls.clients) or (cls.ble is not None and cls.ble.is_connected())
+
     @classmethod
     def publish(cls, payload: dict):
         """
@@ -132,19 +156,56 @@ class Server(WebSocketServer):
         if not cls.loop:
             return
 
-        async def _send_all():
-            # Send to WebSocket clients
-            for ws in list(cls.clients):
-                try:
-                    await cls().send(ws, payload)
-                except Exception as e:
-                    cls.logger.error(e)
-            
-            # Send to BLE device if connected
-            if cls.ble and cls.ble.is_connected() and cls.ble.write_char is not None:
-                try:
-                    await cls.ble.write_json(payload)
-                except Exception as e:
-                    cls.logger.error(f"BLE write error: {e}")
-
-        asyncio.run_coroutine_threadsafe(_send_all(), cls.loop)
+        asyncio.run_coroutine_threadsafe(cls._send_all(payload), cls.loop)
+
+    @classmethod
+    def publish_latest(cls, payload):
+        """
+        Seperti publish, tapi untuk stream realtime (media/audio):
+        payload yang belum sempat terkirim diganti dengan yang terbaru,
+        jadi client lambat tidak menumpuk frame basi
+        """
+        if not cls.loop:
+            return
+
+        cls._latest_payload = payload
+        if not cls._latest_scheduled:
+            cls._latest_scheduled = True
+            asyncio.run_coroutine_threadsafe(cls._flush_latest(), cls.loop)
+
+    @classmethod
+    async def _flush_latest(cls):
+        try:
+            while cls._latest_payload is not None:
+                payload, cls._latest_payload = cls._latest_payload, None
+                await cls._send_all(payload, latest=True)
+        finally:
+            cls._latest_scheduled = False
+
+    @classmethod
+    async def _fan_out(cls, msg):
+        """Kirim pesan (sudah di-serialize) ke semua client secara paralel"""
+        results = await asyncio.gather(
+            *(ws.send(msg) for ws in list(cls.clients)),
+            return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                cls.logger.error("Error sending message: %s", result)
+
+    @classmethod
+    async def _send_all(cls, payload, latest=False):
+        # Serialize sekali untuk WebSocket dan BLE
+        msg = json_dumps(payload) if isinstance(payload, dict) else payload
+
+        # Send to WebSocket clients (kirim paralel supaya satu client
+        # lambat tidak menahan client lain)
+        if cls.clients:
+            await cls._fan_out(msg)
+        
+        # Send to BLE device if connected
+        if cls.ble and cls.ble.is_connected() and cls.ble.write_char is not None:
+            try:
+                await cls.ble.write_json(msg, latest=latest)
+            except Exception as e:
+                cls.logger.error("BLE write error: %s", e)
@@ -1,18 +1,21 @@
 import asyncio
 import websockets
-import json
-from .helper import logging
+from .helper import logging, json_dumps
 
 class WebSocketServer:
     def __init__(self, host="0.0.0.0", port=8000):
         self.host = host
         self.port = port
         self.clients = set()
-        self.logger = logging.getLogger(f"{__name__}")
+        self.logger = logging.getLogger(__name__)
 
     async def start(self):
-        self.logger.info(f"WebSocket Server running on ws://{self.host}:{self.port}")
-        async with websockets.serve(self._handler, self.host, self.port):
+        self.logger.info("WebSocket Server running on ws://%s:%s", self.host, self.port)
+        # Payload kecil (~100 B) dan sering: permessage-deflate hanya
+        # menambah CPU tanpa mengecilkan frame
+        async with websockets.serve(
+            self._handler, self.host, self.port, compression=None
+        ):
             await asyncio.Future()   # run forever
 
     async def _handler(self, websocket):
@@ -23,14 +26,14 @@ class WebSocketServer:
 
         try:
             async for message in websocket:
-                self.logger.debug(f"Received from client: {message}")
+                self.logger.debug("Received from client: %s", message)
                 await self.on_message(websocket, message)
 
         except websockets.ConnectionClosed as e:
-            self.logger.warning(f"Connection closed: {e}")
+            self.logger.warning("Connection closed: %s", e)
         
         except Exception as e:
-            self.logger.error(f"WebSocket handler error: {e}")
+            self.logger.error("WebSocket handler error: %s", e)
 
         finally:
             # Client disconnect
@@ -42,31 +45,36 @@ class WebSocketServer:
 
     # ============== PUBLIC METHODS ==============
     async def send(self, websocket, data):
-        """Send to specific client."""
+        """Send to specific client (dict di-serialize, str dikirim apa adanya)."""
         try:
-            msg = json.dumps(data) if isinstance(data, dict) else str(data)
+            msg = data if isinstance(data, str) else (
+                json_dumps(data) if isinstance(data, dict) else str(data)
+            )
             await websocket.send(msg)
-            self.logger.debug(f"Sent to client: {msg}")
+            self.logger.debug("Sent to client: %s", msg)
         except Exception as e:
-            self.logger.error(f"Error sending message: {e}")
+            self.logger.error("Error sending message: %s", e)
 
     async def broadcast(self, data):
         """Send to all connected clients."""
-        msg = json.dumps(data) if isinstance(data, dict) else str(data)
-        self.logger.debug(f"Broadcasting: {msg}")
+        msg = json_dumps(data) if isinstance(data, dict) else str(data)
+        self.logger.debug("Broadcasting: %s", msg)
 
         if self.clients:
-            try:
-                await asyncio.gather(*(c.send(msg) for c in self.clients))
-            except Exception as e:
-                self.logger.error(f"Broadcast error: {e}")
+            results = await asyncio.gather(
+                *(c.send(msg) for c in list(self.clients)),
+                return_exceptions=True
+            )
+            for result in results:
+                if isinstance(result, Exception):
+                    self.logger.error("Broadcast error: %s", result)
 
     # ============== EVENT HOOKS ==============
     async def on_connect(self, ws):
         self.logger.info("on_connect: Client joined")
     
     async def on_message(self, ws, message):
-        self.logger.debug(f"on_message: {message}")
+        self.logger.debug("on_message: %s", message)
     
     async def on_disconnect(self, ws):
         self.logger.info("on_disconnect: Client left")
@@ -17,6 +17,13 @@ from winsdk.windows.media.control import \
 # Setup logging
 logger = logging.getLogger(__name__)
 
+# Interval polling cadangan saat event WinRT aktif (detik)
+EVENT_FALLBACK_POLL_INTERVAL = 5.0
+
+# Batas atas interval polling adaptif (tanpa event WinRT) saat idle
+IDLE_POLL_INTERVAL = 2.0
+POLL_BACKOFF_FACTOR = 1.5
+
 
 class MediaStatus(Enum):
     """Enum untuk status media playback"""
@@ -29,6 +36,10 @@ class MediaStatus(Enum):
     UNKNOWN = -1
 
 
+# Lookup playback_status WinRT (0-5) -> MediaStatus
+_STATUS_LOOKUP = tuple(MediaStatus(i) for i in range(6))
+
+
 class MediaEvent(Enum):
     """Enum untuk tipe event media"""
     PLAY = "play"
@@ -39,7 +50,7 @@ class MediaEvent(Enum):
     STATUS_CHANGED = "status_changed"
 
 
-@dataclass
+@dataclass(slots=True)
 class MediaInfo:
     """Data class untuk informasi media"""
     title: str = "Unknown"
@@ -97,21 +108,24 @@ class WindowsMediaController:
         await controller.stop()
     """
     
-    def __init__(self, poll_interval: float = 0.2):
+    def __init__(self, poll_interval: float = 0.2,
+                 idle_poll_interval: float = IDLE_POLL_INTERVAL):
         """
         Initialize controller
         
         Args:
-            poll_interval: Interval polling dalam detik (default: 0.2)
+            poll_interval: Interval polling dalam detik saat ada perubahan (default: 0.2)
+            idle_poll_interval: Interval polling maksimum saat idle (default: 2.0)
         """
         self.poll_interval = poll_interval
+        self.idle_poll_interval = max(idle_poll_interval, poll_interval)
         self.is_running = False
         
         # Current state
         self._current_media = MediaInfo()
         self._last_triggered_media = MediaInfo()  # Track last media yang di-trigger event
         
-        # Event handlers
+        # Event handlers: list (is_async, handler), cek coroutine sekali
         self._event_handlers: Dict[MediaEvent, list] = {
             MediaEvent.PLAY: [],
             MediaEvent.PAUSE: [],
@@ -124,46 +138,70 @@ class WindowsMediaController:
         # Background task
         self._poller_task: Optional[asyncio.Task] = None
         
+        # Task handler async yang masih berjalan (ditunggu saat stop)
+        self._pending_tasks: set = set()
+        
+        # Session manager WinRT (request sekali, dipakai ulang)
+        self._manager = None
+        
+        # WinRT event subscription (poller dibangunkan saat ada event)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._changed = asyncio.Event()
+        self._manager_tokens = None
+        self._watched_session = None
+        self._watched_source_id: Optional[str] = None
+        # Di-set saat session manager berubah: session harus di-attach ulang
+        # (tab browser berbeda punya AUMID yang sama)
+        self._rewatch_session = False
+        self._session_tokens = None
+        
         # First run flag
         self._first_run = True
+        
+        # Key raw hasil poll terakhir (skip build MediaInfo jika sama)
+        self._last_key: Optional[tuple] = None
+        
+        # Di-set setelah poll pertama selesai (cache siap dibaca)
+        self._ready = asyncio.Event()
     
     # ==================== Event Registration ====================
     
+    def _add_handler(self, event: MediaEvent, callback: Callable):
+        """Simpan handler beserta jenisnya (sync/async)"""
+        self._event_handlers[event].append(
+            (asyncio.iscoroutinefunction(callback), callback)
+        )
+        return self
+    
     def on_play(self, callback: Callable[[MediaInfo], None]):
         """Register callback untuk event play"""
-        self._event_handlers[MediaEvent.PLAY].append(callback)
-        return self
+        return self._add_handler(MediaEvent.PLAY, callback)
     
     def on_pause(self, callback: Callable[[MediaInfo], None]):
         """Register callback untuk event pause"""
-        self._event_handlers[MediaEvent.PAUSE].append(callback)
-        return self
+        return self._add_handler(MediaEvent.PAUSE, callback)
     
     def on_stop(self, callback: Callable[[MediaInfo], None]):
         """Register callback untuk event stop"""
-        self._event_handlers[MediaEvent.STOP].append(callback)
-        return self
+        return self._add_handler(MediaEvent.STOP, callback)
     
     def on_media_changed(self, callback: Callable[[MediaInfo, MediaInfo], None]):
         """
         Register callback untuk event media berubah
         Callback menerima (old_media, new_media)
         """
-        self._event_handlers[MediaEvent.MEDIA_CHANGED].append(callback)
-        return self
+        return self._add_handler(MediaEvent.MEDIA_CHANGED, callback)
     
     def on_session_changed(self, callback: Callable[[MediaInfo], None]):
         """Register callback untuk event aplikasi media berubah"""
-        self._event_handlers[MediaEvent.SESSION_CHANGED].append(callback)
-        return self
+        return self._add_handler(MediaEvent.SESSION_CHANGED, callback)
     
     def on_status_changed(self, callback: Callable[[MediaStatus, MediaStatus, MediaInfo], None]):
         """
         Register callback untuk event status berubah
         Callback menerima (old_status, new_status, media_info)
         """
-        self._event_handlers[MediaEvent.STATUS_CHANGED].append(callback)
-        return self
+        return self._add_handler(MediaEvent.STATUS_CHANGED, callback)
     
     # ==================== Lifecycle ====================
     
@@ -175,6 +213,10 @@ class WindowsMediaController:
         
         self.is_running = True
         self._first_run = True
+        self._last_key = None
+        self._ready.clear()
+        self._loop = asyncio.get_running_loop()
+        await self._subscribe_manager_events()
         self._poller_task = asyncio.create_task(self._background_poller())
     
     async def stop(self):
@@ -191,6 +233,12 @@ class WindowsMediaController:
             except asyncio.CancelledError:
                 pass
         
+        if self._pending_tasks:
+            await asyncio.gather(*self._pending_tasks, return_exceptions=True)
+        
+        self._unwatch_session()
+        self._unsubscribe_manager_events()
+        
         logger.info("Windows Media Controller stopped")
     
     # ==================== Public Methods ====================
@@ -199,6 +247,22 @@ class WindowsMediaController:
         """Get informasi media saat ini (instant, dari cache)"""
         return self._current_media
     
+    async def wait_ready(self, timeout: float = 0.5) -> bool:
+        """
+        Tunggu sampai poll pertama selesai
+        
+        Args:
+            timeout: Batas waktu tunggu dalam detik (default: 0.5)
+            
+        Returns:
+            True jika cache sudah siap, False jika timeout
+        """
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self._ready.is_set()
+    
     def is_media_playing(self) -> bool:
         """Check apakah ada media yang sedang playing"""
         return self._current_media.is_playing
@@ -208,38 +272,79 @@ class WindowsMediaController:
     async def _background_poller(self):
         """Background task untuk polling media info"""
         logger.info("Media poller started")
+        backoff = self.poll_interval
         
         while self.is_running:
+            # Clear sebelum poll: event yang datang selama poll
+            # membuat wait berikutnya langsung selesai
+            self._changed.clear()
+            previous = self._current_media
+            
             try:
                 await self._poll_and_detect_changes()
             except Exception as e:
-                logger.error(f"Poller error: {e}", exc_info=True)
+                logger.error("Poller error: %s", e, exc_info=True)
             
-            await asyncio.sleep(self.poll_interval)
+            self._ready.set()
+            
+            # Tanpa event: interval adaptif, reset ke poll_interval saat
+            # media berubah, backoff bertahap sampai idle_poll_interval
+            if self._current_media != previous:
+                backoff = self.poll_interval
+            else:
+                backoff = min(backoff * POLL_BACKOFF_FACTOR, self.idle_poll_interval)
+            
+            # Dengan event WinRT, polling hanya sebagai safety net
+            interval = (
+                EVENT_FALLBACK_POLL_INTERVAL if self._manager_tokens
+                else backoff
+            )
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
         
         logger.info("Media poller stopped")
     
     async def _poll_and_detect_changes(self):
         """Poll media info dan deteksi perubahan"""
         try:
-            # Get current session
-            sessions = await MediaManager.request_async()
-            current_session = sessions.get_current_session()
+            # Get current session (manager di-request sekali, lalu di-cache)
+            if self._manager is None:
+                self._manager = await MediaManager.request_async()
+            current_session = self._manager.get_current_session()
             
             # No active session
             if not current_session:
+                self._unwatch_session()
                 await self._handle_no_session()
                 return
             
-            # Get unique session ID
-            session_id = str(id(current_session))
+            # Subscribe event session baru (media properties / playback info)
+            self._watch_session(current_session)
+            
+            # Session ID stabil: AUMID aplikasi media (id() proxy WinRT
+            # bisa berubah di setiap request tanpa session benar-benar ganti)
+            session_id = current_session.source_app_user_model_id
             
             # Get media properties
             info = await current_session.try_get_media_properties_async()
             playback_info = current_session.get_playback_info()
             
+            # Fast path: data raw sama dengan poll sebelumnya, tidak ada
+            # yang perlu dibangun atau dibandingkan
+            playback_status = playback_info.playback_status
+            key = (info.title, info.artist, info.album_title, playback_status, session_id)
+            if key == self._last_key:
+                return
+            self._last_key = key
+            
             # Parse status
-            status = MediaStatus(playback_info.playback_status) if playback_info.playback_status in range(6) else MediaStatus.UNKNOWN
+            status = (
+                _STATUS_LOOKUP[playback_status]
+                if 0 <= playback_status < len(_STATUS_LOOKUP)
+                else MediaStatus.UNKNOWN
+            )
             is_playing = (status == MediaStatus.PLAYING)
             
             # Create new media info
@@ -263,7 +368,92 @@ class WindowsMediaController:
                 self._first_run = False
             
         except Exception as e:
-            logger.error(f"Error polling media: {e}", exc_info=True)
+            logger.error("Error polling media: %s", e, exc_info=True)
+    
+    def _on_winrt_event(self, sender, args):
+        """Handler event WinRT (dipanggil dari thread WinRT)"""
+        loop = self._loop
+        if loop and not loop.is_closed():
+            loop.call_soon_threadsafe(self._changed.set)
+    
+    def _on_manager_event(self, sender, args):
+        """Handler event session manager (dipanggil dari thread WinRT)"""
+        loop = self._loop
+        if loop and not loop.is_closed():
+            loop.call_soon_threadsafe(self._mark_session_changed)
+    
+    def _mark_session_changed(self):
+        """Tandai session perlu di-attach ulang lalu bangunkan poller"""
+        self._rewatch_session = True
+        self._changed.set()
+    
+    async def _subscribe_manager_events(self):
+        """Subscribe event session manager, fallback ke polling jika gagal"""
+        try:
+            if self._manager is None:
+                self._manager = await MediaManager.request_async()
+            self._manager_tokens = (
+                self._manager.add_current_session_changed(self._on_manager_event),
+                self._manager.add_sessions_changed(self._on_manager_event),
+            )
+        except Exception as e:
+            logger.warning("WinRT media events unavailable, polling only: %s", e)
+            self._manager_tokens = None
+    
+    def _unsubscribe_manager_events(self):
+        """Lepas subscription event session manager"""
+        if self._manager and self._manager_tokens:
+            try:
+                current_token, sessions_token = self._manager_tokens
+                self._manager.remove_current_session_changed(current_token)
+                self._manager.remove_sessions_changed(sessions_token)
+            except Exception as e:
+                logger.debug("Failed to remove manager events: %s", e)
+        
+        self._manager_tokens = None
+    
+    def _watch_session(self, session):
+        """Subscribe event media properties / playback info dari session"""
+        if not self._manager_tokens:
+            return
+        
+        source_id = session.source_app_user_model_id
+        if (
+            self._watched_session is not None
+            and not self._rewatch_session
+            and source_id == self._watched_source_id
+        ):
+            return
+        
+        self._rewatch_session = False
+        
+        self._unwatch_session()
+        
+        try:
+            self._session_tokens = (
+                session.add_media_properties_changed(self._on_winrt_event),
+                session.add_playback_info_changed(self._on_winrt_event),
+            )
+            self._watched_session = session
+            self._watched_source_id = source_id
+        except Exception as e:
+            logger.debug("Failed to subscribe session events: %s", e)
+            self._session_tokens = None
+    
+    def _unwatch_session(self):
+        """Lepas subscription event session sebelumnya"""
+        session = self._watched_session
+        if session is not None and self._session_tokens:
+            try:
+                props_token, playback_token = self._session_tokens
+                session.remove_media_properties_changed(props_token)
+                session.remove_playback_info_changed(playback_token)
+            except Exception as e:
+                logger.debug("Failed to remove session events: %s", e)
+        
+        self._watched_session = None
+        self._watched_source_id = None
+        self._session_tokens = None
     
     async def _handle_no_session(self):
         """Handle ketika tidak ada session aktif"""
@@ -272,6 +462,7 @@ class WindowsMediaController:
             await self._trigger_event(MediaEvent.STOP, self._current_media)
         
         # Reset to unknown
+        self._last_key = None
         self._current_media = MediaInfo()
         self._last_triggered_media = MediaInfo()
     
@@ -313,12 +504,26 @@ class WindowsMediaController:
         """Trigger event handlers"""
         handlers = self._event_handlers.get(event, [])
         
-        for handler in handlers:
+        for is_async, handler in handlers:
             try:
-                # Support both sync and async handlers
-                if asyncio.iscoroutinefunction(handler):
-                    await handler(*args)
+                # Handler async dijalankan sebagai task supaya handler
+                # lambat tidak menahan deteksi perubahan berikutnya
+                if is_async:
+                    task = asyncio.create_task(handler(*args))
+                    self._pending_tasks.add(task)
+                    task.add_done_callback(
+                        lambda t, name=event.value: self._on_handler_done(t, name)
+                    )
                 else:
                     handler(*args)
             except Exception as e:
-                logger.error(f"Error in event handler for {event.value}: {e}", exc_info=True)
+                logger.error("Error in event handler for %s: %s", event.value, e, exc_info=True)
+    
+    def _on_handler_done(self, task: asyncio.Task, event_name: str):
+        """Done-callback task handler: lepas dari pending & log error"""
+        self._pending_tasks.discard(task)
+        if task.cancelled():
+            return
+        e = task.exception()
+        if e is not None:
+            logger.error("Error in event handler for %s: %s", event_name, e, exc_info=e)
@@ -1,11 +1,14 @@
 from lib import MediaAudioMonitor, NotificationMonitor, Server
+from lib.helper import json_dumps
 import asyncio
 import signal
 import os
 import sys
 import tempfile
 import traceback
-import json
+import logging
+import time
+from dataclasses import dataclass
 
 
 LOCK_FILE = os.path.join(
@@ -13,28 +16,44 @@ LOCK_FILE = os.path.join(
     "esp32_pet_backend.lock"
 )
 
+def _create_lock_file():
+    """Buat lock file secara atomic (gagal jika sudah ada)"""
+    fd = os.open(LOCK_FILE, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+    try:
+        os.write(fd, str(os.getpid()).encode())
+    finally:
+        os.close(fd)
+
+
 def acquire_lock():
     """Prevent backend from running multiple times"""
-    if os.path.exists(LOCK_FILE):
+    for attempt in range(2):
+        try:
+            _create_lock_file()
+            return
+        except FileExistsError:
+            if attempt:
+                # Instance lain membuat lock di antara hapus dan retry
+                print("[INFO] Backend already running, exit.")
+                sys.exit(0)
+        except Exception:
+            sys.exit(1)
+
+        # Lock sudah ada: cek apakah proses pemiliknya masih hidup
         try:
             with open(LOCK_FILE, "r") as f:
                 pid = int(f.read().strip())
 
             os.kill(pid, 0)
-            print("[INFO] Backend already running, exit.")
-            sys.exit(0)
-
         except Exception:
+            # Stale lock, hapus lalu coba buat sekali lagi
             try:
                 os.remove(LOCK_FILE)
             except Exception:
                 pass
-
-    try:
-        with open(LOCK_FILE, "w") as f:
-            f.write(str(os.getpid()))
-    except Exception:
-        sys.exit(1)
+        else:
+            print("[INFO] Backend already running, exit.")
+            sys.exit(0)
 
 
 def release_lock():
@@ -50,10 +69,23 @@ notif_monitor = None
 server = None
 shutdown_event = asyncio.Event()
 server_task = None
+main_loop = None
 
 # Track last media state untuk avoid spam
-last_media_data = None
+last_media_state = None
 AMPLITUDE_THRESHOLD = 0.01  # Minimum amplitude untuk dianggap "ada audio"
+AMPLITUDE_DELTA = 0.02      # Perubahan amplitude minimum untuk kirim ulang
+MAX_SEND_GAP = 0.2          # Saat audio aktif, kirim minimal tiap 0.2 detik
+
+# Loop publish dibangunkan oleh perubahan data; timeout hanya safety net
+IDLE_INTERVAL = 1.0
+
+
+def request_shutdown():
+    """Set shutdown_event dan bangunkan publish loop (jalan di event loop)"""
+    shutdown_event.set()
+    if media_monitor:
+        media_monitor.wake()
 
 
 def on_notification_received(notif):
@@ -67,50 +99,79 @@ def on_notification_received(notif):
                 "time": timestamp,
                 "texts": notif.texts
             }
-            Server.publish(json.dumps(notification_json))
+            Server.publish(json_dumps(notification_json))
+
+
+@dataclass(slots=True)
+class LastMediaState:
+    """State media terakhir yang dipakai should_send_media"""
+    title: str
+    is_playing: bool
+    amplitude: float
+    sent_at: float = 0.0
 
 
-def should_send_media(new_data):
+def next_wait_timeout():
+    """
+    Timeout untuk wait_changed: saat audio aktif, loop harus bangun paling
+    lambat MAX_SEND_GAP supaya refresh tetap terkirim walau nilai audio
+    (yang sudah di-round) tidak berubah
+    """
+    last = last_media_state
+    if last is not None and last.amplitude > AMPLITUDE_THRESHOLD:
+        return min(IDLE_INTERVAL, MAX_SEND_GAP)
+    return IDLE_INTERVAL
+
+
+def should_send_media(new_dict):
     """
     Tentukan apakah media data perlu dikirim.
     Hanya kirim jika:
-    1. Ada audio aktif (amplitude > threshold), ATAU
+    1. Ada audio aktif (amplitude > threshold) dan amplitude berubah
+       cukup jauh / sudah MAX_SEND_GAP sejak kirim terakhir, ATAU
     2. Status berubah (playing/paused/stopped)
     """
-    global last_media_data
+    global last_media_state
     
     try:
-        new_dict = json.loads(new_data) if isinstance(new_data, str) else new_data
+        # Field selalu lengkap dari MediaAudioMonitor, akses langsung
+        amplitude = new_dict["audio_amplitude"]["amplitude"]
+        is_playing = new_dict["is_playing"]
+        title = new_dict["title"]
+        last = last_media_state
         
-        # Cek amplitude
-        amplitude = new_dict.get("audio_amplitude", {}).get("amplitude", 0.0)
-        is_playing = new_dict.get("is_playing", False)
-        
-        # Jika ada audio aktif, selalu kirim
+        # Jika ada audio aktif, kirim hanya saat amplitude berubah cukup
+        # jauh atau sudah lama tidak kirim (perubahan media tetap langsung)
         if amplitude > AMPLITUDE_THRESHOLD:
-            last_media_data = new_dict
-            return True
+            now = time.monotonic()
+            if (
+                last is None
+                or now - last.sent_at >= MAX_SEND_GAP
+                or abs(amplitude - last.amplitude) >= AMPLITUDE_DELTA
+                or title != last.title
+                or is_playing != last.is_playing
+            ):
+                last_media_state = LastMediaState(title, is_playing, amplitude, now)
+                return True
+            return False
         
-        # Jika tidak ada last_media_data, kirim sekali
-        if last_media_data is None:
-            last_media_data = new_dict
+        # Jika tidak ada last_media_state, simpan sekali
+        if last is None:
+            last_media_state = LastMediaState(title, is_playing, amplitude)
             return False  # Tidak perlu kirim data kosong pertama kali
         
-        # Cek apakah ada perubahan status penting
-        old_playing = last_media_data.get("is_playing", False)
-        old_title = last_media_data.get("title", "")
-        new_title = new_dict.get("title", "")
-        
         # Kirim jika:
         # - Status playing berubah dari True ke False (berhenti)
         # - Title berubah (lagu baru)
         changed = (
-            (old_playing and not is_playing) or  # Baru berhenti
-            (old_title != new_title and new_title != "Unknown")  # Lagu baru
+            (last.is_playing and not is_playing) or  # Baru berhenti
+            (last.title != title and title != "Unknown")  # Lagu baru
         )
         
         if changed:
-            last_media_data = new_dict
+            last_media_state = LastMediaState(
+                title, is_playing, amplitude, time.monotonic()
+            )
             return True
         
         # Tidak ada perubahan penting, skip
@@ -122,9 +183,17 @@ def should_send_media(new_data):
 
 
 async def main():
-    global media_monitor, notif_monitor, server, server_task
+    global media_monitor, notif_monitor, server, server_task, main_loop
+
+    loop = main_loop = asyncio.get_running_loop()
 
-    loop = asyncio.get_running_loop()
+    # Signal handler native asyncio (event di-set dari dalam loop);
+    # loop yang tidak mendukung (Windows) tetap pakai signal.signal
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, request_shutdown)
+        except (NotImplementedError, RuntimeError):
+            break
 
     server = Server(host="127.0.0.1", port=8765)
     Server.init_loop(loop)
@@ -150,16 +219,24 @@ async def main():
 
     print("[INFO] Backend started")
 
+    # Bind lokal untuk hot loop (mengikuti rate chunk audio)
+    is_shutdown = shutdown_event.is_set
+    get_json = media_monitor.get_json
+    get_data = media_monitor.get_data
+    wait_changed = media_monitor.wait_changed
+    publish_latest = Server.publish_latest
+    has_subscribers = Server.has_subscribers
+
     try:
-        while not shutdown_event.is_set():
-            json_data = media_monitor.get_json()
-            
-            # Hanya kirim jika ada perubahan penting atau audio aktif
-            if should_send_media(json_data):
-                Server.publish(json_data)
+        while not is_shutdown():
+            # Tanpa penerima tidak perlu cek sama sekali; cek pakai dict
+            # (tanpa parse JSON), JSON hanya di-build saat benar-benar kirim
+            if has_subscribers() and should_send_media(get_data()):
+                publish_latest(get_json())
             
-            # Kurangi frequency checking - 0.1 detik sudah cukup
-            await asyncio.sleep(0.033)
+            # Tidur sampai media/audio berubah (hening = tidak ada wakeup),
+            # request_shutdown juga membangunkan wait ini
+            await wait_changed(timeout=next_wait_timeout())
 
     except asyncio.CancelledError:
         pass
@@ -191,7 +268,14 @@ async def main():
 def signal_handler(sig, frame):
     """Handle SIGINT/SIGTERM"""
     print("\n[INFO] Received shutdown signal")
-    shutdown_event.set()
+    
+    # Windows: handler ini tidak jalan di dalam loop, jadi set event
+    # lewat call_soon_threadsafe supaya loop langsung bangun
+    loop = main_loop
+    if loop is not None and not loop.is_closed():
+        loop.call_soon_threadsafe(request_shutdown)
+    else:
+        shutdown_event.set()
 
 
 def setup_signal_handlers():
@@ -202,6 +286,10 @@ def setup_signal_handlers():
 
 
 if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
     acquire_lock()
     setup_signal_handlers()
 